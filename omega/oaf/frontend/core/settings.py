@@ -6,13 +6,14 @@ from core import get_env_variable, to_bool
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Read environment variables from a file
-try:
-    import dotenv
+# Read environment variables from a file, unless they were already provided (e.g. by the container)
+if "SECRET_KEY" not in os.environ:
+    try:
+        import dotenv
 
-    dotenv.read_dotenv(os.path.join(BASE_DIR, ".env"))
-except Exception:
-    raise ImproperlyConfigured("A .env file was not found. Environment variables are not set.")
+        dotenv.read_dotenv(os.path.join(BASE_DIR, ".env"))
+    except Exception:
+        raise ImproperlyConfigured("A .env file was not found. Environment variables are not set.")
 
 
 SECRET_KEY = get_env_variable("SECRET_KEY")
@@ -61,6 +62,16 @@ TEMPLATES = [
     },
 ]
 
+# Keep compiled templates in memory outside of development
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'core.wsgi.application'
 
 
@@ -74,13 +85,33 @@ DATABASES = {
         "USER": get_env_variable("DATABASE_USER"),
         "PASSWORD": get_env_variable("DATABASE_PASSWORD"),
         "HOST": get_env_variable("DATABASE_HOST"),
-        "PORT": get_env_variable("DATABASE_PORT")
+        "PORT": get_env_variable("DATABASE_PORT"),
+        # Reuse connections across requests instead of reconnecting each time
+        "CONN_MAX_AGE": int(get_env_variable("DATABASE_CONN_MAX_AGE", optional=True) or 600),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
 if DATABASES.get('default', {}).get('ENGINE') == 'django.db.backends.postgresql_psycopg2':
     DATABASES['default']['OPTIONS'] = {"options": "-c statement_timeout=5000"}
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+if to_bool(get_env_variable("ENABLE_CACHE", optional=True)):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "oaffe-cache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_policies(apps, schema_editor):
+    """Merges policies sharing an identifier so the unique constraint (0008) can be added."""
+    Policy = apps.get_model("oaffe", "Policy")
+    PolicyEvaluationResult = apps.get_model("oaffe", "PolicyEvaluationResult")
+    PolicyGroup = apps.get_model("oaffe", "PolicyGroup")
+
+    duplicates = (
+        Policy.objects.order_by()
+        .values("identifier")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        policies = list(Policy.objects.filter(identifier=row["identifier"]).order_by("uuid"))
+
+        # Prefer a policy that has help text (e.g. loaded by reload_cwe_policies)
+        keep = next((p for p in policies if p.help_text), policies[0])
+        others = [p for p in policies if p.pk != keep.pk]
+
+        PolicyEvaluationResult.objects.filter(policy__in=others).update(policy=keep)
+        for group in PolicyGroup.objects.filter(policies__in=others).distinct():
+            group.policies.add(keep)
+        Policy.objects.filter(pk__in=[p.pk for p in others]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("oaffe", "0006_policyevaluationqueue"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_policies, migrations.RunPython.noop),
+    ]
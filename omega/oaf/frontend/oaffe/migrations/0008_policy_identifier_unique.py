@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Kept separate from the data merge in 0007: on PostgreSQL, altering a table in the
+    # same transaction that deleted referenced rows fails with pending trigger events.
+    dependencies = [
+        ("oaffe", "0007_merge_duplicate_policies"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="policy",
+            constraint=models.UniqueConstraint(fields=("identifier",), name="policy_identifier"),
+        ),
+    ]
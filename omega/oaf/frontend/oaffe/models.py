@@ -102,6 +102,9 @@ class Policy(models.Model):
     class Meta:
         verbose_name_plural = "Policies"
         ordering = ['name', 'identifier']
+        constraints = [
+            models.UniqueConstraint(name='policy_identifier', fields=['identifier'])
+        ]
 
 class PolicyEvaluationResult(models.Model):
     """The result of a policy evaluation."""
@@ -1,21 +1,262 @@
-from tempfile import TemporaryDirectory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import reduce
+from tempfile import TemporaryDirectory, TemporaryFile
 import os
 import pathlib
 import sys
 import json
+import operator
 import subprocess
+import threading
+import django
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
 from oaffe.models import Assertion, Policy, Subject, PolicyEvaluationResult
 
 import logging
 
+# Limits for a single (out of process) policy evaluation
+OAF_TIMEOUT = 60 * 60 * 2
+OAF_MAX_OUTPUT = 64 * 1024 * 1024
+
+# Number of subjects fetched (and dispatched to workers) at a time
+SUBJECT_CHUNK_SIZE = 500
+
+# Worker pool shared across calls so repeated refreshes don't pay the fork cost
+_refresh_pool = None
+
+
+def _get_refresh_pool() -> ProcessPoolExecutor:
+    """Returns the (lazily created) process pool used to refresh subjects."""
+    global _refresh_pool  # pylint: disable=global-statement
+    if _refresh_pool is None:
+        # Workers may be spawned rather than forked (macOS, Windows, Python 3.14+),
+        # so make sure Django is set up before they import any models.
+        _refresh_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=django.setup)
+    return _refresh_pool
+
+
+def _reset_refresh_pool():
+    """Discards the process pool (e.g. after a worker died) so the next call creates a new one."""
+    global _refresh_pool  # pylint: disable=global-statement
+    if _refresh_pool is not None:
+        _refresh_pool.shutdown(wait=False, cancel_futures=True)
+        _refresh_pool = None
+
+
+def _refresh_one(subject_uuid: str, clear_first: bool) -> bool:
+    """Re-evaluates policies for a single subject (executed in a worker process).
+
+    Returns False if the refresh raised an exception.
+    """
+    try:
+        subject = Subject.objects.get(uuid=subject_uuid)
+        refresh_policies(subject, clear_first)
+        return True
+    except Exception as msg:
+        logging.warning("Error refreshing policies for %s: %s", subject_uuid, msg)
+        return False
+    finally:
+        connections.close_all()
+
+
+def _refresh_chunk(subject_uuids: list[str], clear_first: bool) -> list[str]:
+    """Refreshes subjects on the worker pool, returning the UUIDs that could not be refreshed.
+
+    If a worker dies, the pool is recreated and unfinished subjects are retried once.
+    """
+    failed = []
+    pending = subject_uuids
+    for attempt in range(2):
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        pool = _get_refresh_pool()
+
+        futures = {}
+        retry = []
+        for subject_uuid in pending:
+            try:
+                futures[subject_uuid] = pool.submit(_refresh_one, subject_uuid, clear_first)
+            except BrokenProcessPool:
+                retry.append(subject_uuid)
+
+        for subject_uuid, future in futures.items():
+            try:
+                if not future.result():
+                    failed.append(subject_uuid)
+            except BrokenProcessPool:
+                retry.append(subject_uuid)
+
+        if not retry:
+            return failed
+
+        _reset_refresh_pool()
+        if attempt == 0:
+            logging.warning(
+                "Policy refresh worker died, retrying %d subjects on a new pool", len(retry)
+            )
+        pending = retry
+
+    logging.warning("Policy refresh worker died again, skipped subjects: %s", pending)
+    return failed + pending
+
+
+def _write_assertion(directory: str, assertion: Assertion):
+    """Writes an assertion's content to {directory}/{uuid}.json as compact JSON."""
+    pathlib.Path(directory, f"{assertion.uuid}.json").write_text(
+        json.dumps(assertion.content, separators=(",", ":")), encoding="utf-8"
+    )
+
+
+def _get_status(result: dict) -> str:
+    """Maps the state reported by oaf.py to a PolicyEvaluationResult status."""
+    _status = result.get("state", "").lower().strip()
+    if _status == "pass":
+        return PolicyEvaluationResult.Status.PASSED
+    if _status in ["fail", "failed"]:
+        return PolicyEvaluationResult.Status.FAILED
+    if _status != "":
+        return PolicyEvaluationResult.Status.INDETERMINATE
+    return PolicyEvaluationResult.Status.UNKNOWN
+
+
+def _save_results(subject: Subject, results: list, clear_first: bool):
+    """Stores policy evaluation results for a subject using bulk queries."""
+    evaluated_by = "org.openssf.alpha-omega.oaf"
+
+    # Fetch all referenced policies at once, creating any that are missing. This is
+    # committed on its own (outside the results transaction), in identifier order, so
+    # concurrent workers creating the same policies don't hold locks on each other.
+    identifiers = {result.get("policy_identifier") for result in results}
+    policies = {p.identifier: p for p in Policy.objects.filter(identifier__in=identifiers)}
+
+    new_policies = {}
+    for result in results:
+        policy_identifier = result.get("policy_identifier")
+        if policy_identifier not in policies and policy_identifier not in new_policies:
+            new_policies[policy_identifier] = Policy(
+                identifier=policy_identifier, name=result.get("policy_name")
+            )
+    if new_policies:
+        # Another worker may insert the same policies first; the unique constraint on
+        # identifier turns those into no-ops, and the re-fetch picks up their rows.
+        Policy.objects.bulk_create(
+            sorted(new_policies.values(), key=lambda p: p.identifier), ignore_conflicts=True
+        )
+        policies.update(
+            (p.identifier, p) for p in Policy.objects.filter(identifier__in=new_policies.keys())
+        )
+
+    with transaction.atomic():
+        if clear_first and results:
+            PolicyEvaluationResult.objects.filter(subject=subject).delete()
+            existing = set()
+        else:
+            existing = set(
+                PolicyEvaluationResult.objects.filter(subject=subject).values_list(
+                    "policy_id", "status", "evaluated_by"
+                )
+            )
+
+        new_results = []
+        matched = set()
+        for result in results:
+            policy = policies[result.get("policy_identifier")]
+            status = _get_status(result)
+
+            logging.debug("Policy %s for %s is %s", policy, subject, status)
+
+            key = (policy.pk, status, evaluated_by)
+            if key in existing:
+                matched.add(key)
+            else:
+                existing.add(key)
+                new_results.append(
+                    PolicyEvaluationResult(
+                        policy=policy, subject=subject, status=status, evaluated_by=evaluated_by
+                    )
+                )
+
+        # Results that were re-confirmed count as evaluated now (as update_or_create's save did)
+        if matched:
+            PolicyEvaluationResult.objects.filter(subject=subject).filter(
+                reduce(
+                    operator.or_,
+                    (Q(policy_id=p, status=s, evaluated_by=e) for p, s, e in matched),
+                )
+            ).update(evaluation_date=timezone.now())
+
+        PolicyEvaluationResult.objects.bulk_create(new_results)
+
+
+def _run_oaf(cmd: list, cwd: str) -> subprocess.CompletedProcess:
+    """Runs oaf.py, streaming its output so that memory stays bounded.
+
+    Raises subprocess.TimeoutExpired if it runs longer than OAF_TIMEOUT, or
+    RuntimeError if it writes more than OAF_MAX_OUTPUT bytes to stdout.
+    """
+    timed_out = threading.Event()
+
+    # stderr (verbose logging) goes to a file so it can't fill a pipe or memory
+    with TemporaryFile() as stderr_file, subprocess.Popen(
+        cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=stderr_file
+    ) as proc:
+        def _kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(OAF_TIMEOUT, _kill)
+        timer.start()
+        try:
+            stdout = bytearray()
+            while chunk := proc.stdout.read(65536):
+                stdout += chunk
+                if len(stdout) > OAF_MAX_OUTPUT:
+                    proc.kill()
+                    raise RuntimeError(f"oaf output exceeded {OAF_MAX_OUTPUT} bytes.")
+            returncode = proc.wait()
+        finally:
+            timer.cancel()
+
+        # Only keep the tail of stderr, which is where any errors will be
+        stderr_file.seek(max(0, stderr_file.seek(0, os.SEEK_END) - 65536))
+        stderr = stderr_file.read().decode("utf-8", errors="replace")
+
+    stdout = stdout.decode("utf-8", errors="replace")
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, OAF_TIMEOUT, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
 
 def refresh_policies(subject: Subject = None, clear_first: bool = False):
-    """Re-evaluates policies."""
-    # Always evaluate one at a time
+    """Re-evaluates policies.
+
+    When refreshing all subjects, raises RuntimeError (after processing the rest)
+    if any subject could not be refreshed.
+    """
+    # Evaluate all subjects in parallel, one worker process per subject
     if not subject:
         logging.debug("Refreshing policies for all subjects")
-        for subject in Subject.objects.all():
-            refresh_policies(subject, clear_first)
+
+        # Page through subjects (by uuid) so memory use doesn't grow with the table
+        failed = []
+        last_uuid = None
+        while True:
+            subjects = Subject.objects.order_by("uuid")
+            if last_uuid is not None:
+                subjects = subjects.filter(uuid__gt=last_uuid)
+            subject_uuids = list(subjects.values_list("uuid", flat=True)[:SUBJECT_CHUNK_SIZE])
+            if not subject_uuids:
+                break
+            last_uuid = subject_uuids[-1]
+
+            failed += _refresh_chunk([str(u) for u in subject_uuids], clear_first)
+
+        if failed:
+            logging.warning("Unable to refresh policies for subjects: %s", failed)
+            raise RuntimeError(f"Unable to refresh policies for {len(failed)} subject(s).")
         return
 
     # Single policy
@@ -26,14 +267,13 @@ def refresh_policies(subject: Subject = None, clear_first: bool = False):
         return
 
     with TemporaryDirectory() as tmpdir:
-        for assertion in Assertion.objects.filter(subject=subject):
-            with open(os.path.join(tmpdir, f"{assertion.uuid}.json"), "w") as f:
-                f.write(json.dumps(assertion.content, indent=2))
+        assertions = list(Assertion.objects.filter(subject=subject))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda a: _write_assertion(tmpdir, a), assertions))
 
         # Run the policy execution tool (out of process)
-        res = None
         try:
-            res = subprocess.run(
+            res = _run_oaf(
                 [
                     sys.executable,
                     "oaf.py",
@@ -45,9 +285,6 @@ def refresh_policies(subject: Subject = None, clear_first: bool = False):
                     subject.identifier,
                 ],
                 cwd=os.path.join(pathlib.Path().resolve(), "../../../omega/oaf/omega"),
-                capture_output=True,
-                timeout=60*60*2,
-                encoding="utf-8",
             )
 
             if res.returncode == 0:
@@ -57,44 +294,14 @@ def refresh_policies(subject: Subject = None, clear_first: bool = False):
                     logging.warning("Error parsing oaf output: %s", msg)
                     return
 
-                already_cleared = False
-
-                for result in results:
-                    policy_identifier = result.get("policy_identifier")
-                    policy_name = result.get("policy_name")
-
-                    policy, _ = Policy.objects.get_or_create(
-                        identifier=policy_identifier, defaults={"name": policy_name}
-                    )
-
-                    _status = result.get("state", "").lower().strip()
-                    if _status == "pass":
-                        status = PolicyEvaluationResult.Status.PASSED
-                    elif _status in ["fail", "failed"]:
-                        status = PolicyEvaluationResult.Status.FAILED
-                    elif _status != "":
-                        status = PolicyEvaluationResult.Status.INDETERMINATE
-                    else:
-                        status = PolicyEvaluationResult.Status.UNKNOWN
-
-                    evaluated_by = "org.openssf.alpha-omega.oaf"
-
-                    logging.debug("Policy %s for %s is %s", policy, subject, status)
-
-
-                    if clear_first and not already_cleared:
-                        already_cleared = True
-                        PolicyEvaluationResult.objects.filter(subject=subject).delete()
-
-                    PolicyEvaluationResult.objects.update_or_create(
-                        policy=policy, subject=subject, status=status, evaluated_by=evaluated_by
-                    )
+                _save_results(subject, results, clear_first)
             else:
                 logging.warning("Error evaluating assertion, return code: %d", res.returncode)
                 logging.warning("STDOUT: %s", res.stdout)
                 logging.warning("STDERR: %s", res.stderr)
 
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as ex:
             logging.warning("Timeout evaluating assertion")
-            logging.warning("STDOUT: %s", res.stdout)
-            logging.warning("STDERR: %s", res.stderr)
+            logging.warning("STDERR: %s", ex.stderr)
+        except RuntimeError as msg:
+            logging.warning("Error evaluating assertion: %s", msg)
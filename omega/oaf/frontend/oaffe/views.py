@@ -31,6 +31,7 @@ from oaffe.models import (
 from oaffe.utils.policy import refresh_policies
 from oaffe.utils.dependencies import get_dependencies
 from django.shortcuts import get_object_or_404
+from django.core.cache import cache
 from django.core.paginator import Paginator
 
 logger = logging.getLogger(__name__)
@@ -392,12 +393,21 @@ def api_get_assertions(request: HttpRequest) -> JsonResponse:
 def api_get_policy_evaluation_results(request: HttpRequest) -> JsonResponse:
     """Retrieve policy evaluations based on API parameters."""
     subject = _get_subject_from_request(request)
+    policy_group_uuid = request.GET.get("policy_group_uuid")
 
-    results = PolicyEvaluationResult.objects.filter(subject=subject)
+    def _get_results():
+        results = PolicyEvaluationResult.objects.filter(subject=subject).select_related(
+            "policy", "subject"
+        )
+
+        # Further filter by policy group
+        if policy_group_uuid is not None:
+            policy_group = get_object_or_404(PolicyGroup, uuid=policy_group_uuid)
+            results = results.filter(policy__in=policy_group.policies.all())
 
-    # Further filter by policy group
-    if "policy_group_uuid" in request.GET:
-        policy_group = get_object_or_404(PolicyGroup, uuid=request.GET.get("policy_group_uuid"))
-        results = results.filter(policy__in=policy_group.policies.all())
+        return list(r.to_dict() for r in results)
 
-    return JsonResponse(list(r.to_dict() for r in results), safe=False, json_dumps_params={"indent": 2})
+    # Only cached when ENABLE_CACHE is set; results may then be up to 60 seconds stale
+    cache_key = f"policies:{subject.uuid}:{policy_group_uuid or ''}"
+    results = cache.get_or_set(cache_key, _get_results, timeout=60)
+    return JsonResponse(results, safe=False, json_dumps_params={"indent": 2})
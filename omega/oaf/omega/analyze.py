@@ -3,12 +3,16 @@
 Executes analysis and creates assertions.
 """
 import fnmatch
+import functools
 import argparse
+import json
 import logging
 import os
+import pathlib
 import shlex
 import subprocess  # nosec: B404
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from dotenv import dotenv_values
@@ -18,6 +22,12 @@ from assertion.utils import get_package_url_with_version, is_command_available
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(message)s")
 
 
+@functools.lru_cache(maxsize=1)
+def _load_env() -> dict:
+    """Loads the .env file once; the result is shared (read-only) by all runners."""
+    return dotenv_values(".env")
+
+
 class AnalysisRunner:
     """
     Executes analysis and creates assertions.
@@ -36,19 +46,38 @@ class AnalysisRunner:
 
         self.docker_cmdline = None
 
-        for command in required_commands:
-            if not is_command_available(command):
+        # Index of files in the work directory (filename -> path), built after the toolchain runs
+        self._output_index: dict[str, str] | None = None
+        self._output_files: list[tuple[str, str]] = []
+
+        # Each check spawns a process, so run them concurrently
+        with ThreadPoolExecutor(max_workers=len(required_commands)) as executor:
+            results = list(executor.map(is_command_available, required_commands))
+
+        for command, is_available in zip(required_commands, results):
+            if not is_available:
                 raise EnvironmentError(f"Required command {command} is not available.")
 
         if not os.path.isfile(".env"):
             raise EnvironmentError("Missing .env file.")
-        self.env = dotenv_values(".env")
+        self.env = _load_env()
+        # Bare KEY lines in .env have no value (None); leave those to the inherited environment
+        self._merged_env = {**os.environ, **{k: v for k, v in self.env.items() if v is not None}}
 
         self.docker_container = docker_container
         self.package_url = get_package_url_with_version(package_url)
         self.repository = repository
         self.signer = signer
 
+        # Options shared by every assertion; individual assertions only add what differs
+        self._base_assertion_cmd = [
+            "python", "oaf.py", "--verbose", "generate",
+            f"--subject={self.package_url}",
+            f"--repository={self.repository}",
+        ]
+        if self.signer:
+            self._base_assertion_cmd.append(f"--signer={self.signer}")
+
         # Set up the work directory (default: temporary, or provided by the user)
         if work_directory:
             self.work_directory = work_directory
@@ -63,9 +92,10 @@ class AnalysisRunner:
         os.makedirs(self.work_directory_name, exist_ok=True)
 
         _wd = self.work_directory if isinstance(self.work_directory, str) else self.work_directory.name
-        if os.listdir(_wd):
-            logging.fatal("Output directory (%s) must be empty.", self.work_directory_name)
-            raise EnvironmentError("Output directory must be empty.")
+        with os.scandir(_wd) as entries:
+            if next(entries, None) is not None:
+                logging.fatal("Output directory (%s) must be empty.", self.work_directory_name)
+                raise EnvironmentError("Output directory must be empty.")
 
     def __enter__(self):
         return self
@@ -88,196 +118,225 @@ class AnalysisRunner:
             "-t",
             "-v",
             f"{self.work_directory_name}:/opt/export",
-            "--env-file",
-            ".env",
-            self.docker_container,
-            str(self.package_url),
         ]
 
+        # Pass the already-parsed .env by name; values come from the client's environment
+        # (for bare KEY entries, that's whatever was inherited, as with --env-file)
+        for key in self.env:
+            cmd += ["--env", key]
+
+        cmd += [self.docker_container, str(self.package_url)]
+
         # Limit CPU usage if OMEGA_DOCKER_CPUS is set
         if os.environ.get('OMEGA_DOCKER_CPUS'):
             cmd.insert(cmd.index('-t'), f'--cpus={os.environ.get("OMEGA_DOCKER_CPUS")}')
 
-        # Write the command to a file so we can capture it later
+        # Write the command to a file so we can capture it later (only if OMEGA_RECORD_CMD is set)
         self.docker_cmdline = shlex.join(cmd)
-        with open(f"{self.work_directory_name}/top-execute-cmd.txt", "w", encoding="utf-8") as f:
-            f.write(self.docker_cmdline)
+        if os.environ.get('OMEGA_RECORD_CMD'):
+            cmd_filename = pathlib.Path(self.work_directory_name, "top-execute-cmd.txt")
+            cmd_filename.write_text(self.docker_cmdline, encoding="utf-8")
 
         logging.debug("Running command: %s", cmd)
+
+        # Container output is only ever logged at DEBUG, so otherwise don't read it at all
+        log_output = logging.getLogger().isEnabledFor(logging.DEBUG)
         with subprocess.Popen(  # nosec B603
             cmd,
-            stdout=subprocess.PIPE,
+            stdout=subprocess.PIPE if log_output else subprocess.DEVNULL,
             stderr=subprocess.STDOUT,
-            encoding="utf-8",
-            universal_newlines=True
+            env=self._merged_env
         ) as res:
-            for line in iter(res.stdout.readline, ""):
-                logging.debug(line.rstrip())
-
-            res.stdout.close()
+            if log_output:
+                # Read in large chunks rather than line-by-line to keep syscalls down
+                pending = bytearray()
+                fd = res.stdout.fileno()
+                while chunk := os.read(fd, 65536):
+                    pending += chunk
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        logging.debug(line.decode("utf-8", errors="replace").rstrip())
+                if pending:
+                    logging.debug(pending.decode("utf-8", errors="replace").rstrip())
+
+                res.stdout.close()
 
             if res.wait() != 0:
                 raise RuntimeError(f"Error running docker container: {res.stderr}")
 
-    def _execute_assertion_noexcept(self, **kwargs):
-        try:
-            if 'input-file' in kwargs and not kwargs.get('input-file'):
-                logging.warning("Skipping assertion because input file is not set.")
-                return
-            self._execute_assertion(**kwargs)
-        except Exception as msg:
-            logging.error("Error executing assertion: %s", msg)
-
-    def _execute_assertion(self, **kwargs):
-        """Executes a single assertion."""
-        logging.info("Running assertion %s", kwargs.get("assertion"))
-        cmd = ["python", "oaf.py", "--verbose", "generate"]
+        self._build_output_index()
 
-        if "expiration" not in kwargs:
-            kwargs["expiration"] = datetime.strftime(
-                datetime.now() + timedelta(days=2 * 365), "%Y-%m-%dT%H:%M:%S.%fZ"
-            )
-        else:
-            cmd.append(f"--expiration={kwargs['expiration']}")
-
-        if kwargs.get('signer'):
-            cmd.append(f"--signer={kwargs['signer']}")
+    def _execute_assertions_batch(self, assertions: list[dict]):
+        """Executes a list of assertions in a single oaf.py invocation."""
+        expiration = datetime.strftime(
+            datetime.now() + timedelta(days=2 * 365), "%Y-%m-%dT%H:%M:%S.%fZ"
+        )
 
-        for key, value in kwargs.items():
-            cmd.append(f"--{key}")
-            if value is None:
-                cmd.append("")
-            else:
-                cmd.append(str(value))
+        batch = []
+        for kwargs in assertions:
+            if 'input-file' in kwargs and not kwargs.get('input-file'):
+                logging.warning(
+                    "Skipping assertion %s because input file is not set.", kwargs.get("assertion")
+                )
+                continue
+
+            logging.info("Queueing assertion %s", kwargs.get("assertion"))
+            entry = {"expiration": expiration}
+            for key, value in kwargs.items():
+                entry[key] = None if value is None else str(value)
+            batch.append(entry)
+
+        if not batch:
+            logging.warning("No assertions to execute.")
+            return
+
+        # Keep the manifest out of the (user-visible) output directory
+        with tempfile.NamedTemporaryFile(
+            "w", prefix="omega-batch-", suffix=".json", encoding="utf-8", delete=False
+        ) as f:
+            json.dump(batch, f)
+            batch_filename = f.name
+
+        cmd = self._base_assertion_cmd + ["--batch", batch_filename]
 
         logging.debug("Running command: %s", cmd)
-        _env = os.environ.copy()
-        _env.update(self.env)
 
-        res = subprocess.run(  # nosec B603
-            cmd, check=False, capture_output=True, encoding="utf-8", env=_env
-        )
+        try:
+            res = subprocess.run(  # nosec B603
+                cmd, check=False, capture_output=True, encoding="utf-8", env=self._merged_env
+            )
+        except Exception as msg:
+            logging.error("Error executing assertions: %s", msg)
+            return
+        finally:
+            os.remove(batch_filename)
 
         if res.returncode != 0:
             logging.debug("Error Code: %d", res.returncode)
             logging.debug("Output:\n%s", res.stdout)
             logging.debug("Error:\n%s", res.stderr)
 
+    def _iter_output_files(self):
+        """Yields (filename, path) for each file in the output directory, depth-first."""
+        stack = [self.work_directory_name]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.name, entry.path
+
+    def _build_output_index(self):
+        """Indexes all files in the output directory so lookups don't need to re-walk it."""
+        self._output_index = {}
+        self._output_files = []
+        for file, path in self._iter_output_files():
+            self._output_index.setdefault(file, path)
+            self._output_files.append((file, path))
+
     def find_output_file(self, filename: str) -> str:
         """Finds the first file in the output directory that matches the given filename/glob."""
-        for root, _, files in os.walk(self.work_directory_name):
-            if filename in files:
-                return os.path.join(root, filename)
+        if self._output_index is None:
+            # Not indexed yet, so scan and stop at the first match
+            for file, path in self._iter_output_files():
+                if file == filename or fnmatch.fnmatch(file, filename):
+                    return path
+            return None
 
-            for file in files:
-                if fnmatch.fnmatch(file, filename):
-                    return os.path.join(root, file)
+        path = self._output_index.get(filename)
+        if path:
+            return path
 
-        for root, _, files in os.walk(self.work_directory_name):
-            if filename in files:
-                return os.path.join(root, filename)
+        for file, path in self._output_files:
+            if fnmatch.fnmatch(file, filename):
+                return path
 
         return None
 
-    def execute_assertions(self):
-        """Execute all assertions."""
-        # Scorecards
-        self._execute_assertion_noexcept(
-            **{
-                "assertion": "SecurityScorecard",
-                "subject": self.package_url,
-                "repository": self.repository,
-                "signer": self.signer
+    def find_output_files(self, filenames: list[str]) -> dict[str, str]:
+        """Finds the first file matching each of the given filenames/globs in a single pass."""
+        if self._output_index is not None:
+            return {
+                filename: path
+                for filename in filenames
+                if (path := self.find_output_file(filename))
             }
-        )
 
-        # Security Advisories
-        self._execute_assertion_noexcept(
-            **{
-                "assertion": "SecurityAdvisory",
-                "subject": self.package_url,
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
+        results = {}
+        remaining = list(filenames)
+        for file, path in self._iter_output_files():
+            for filename in [f for f in remaining if file == f or fnmatch.fnmatch(file, f)]:
+                results[filename] = path
+                remaining.remove(filename)
+            if not remaining:
+                break
 
-        # Reproducibility
-        self._execute_assertion_noexcept(
-            **{
-                "assertion": "Reproducible",
-                "subject": self.package_url,
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
+        return results
+
+    def execute_assertions(self):
+        """Execute all assertions."""
+        sarif_filenames = [
+            'tool-semgrep.sarif',
+            'tool-devskim.sarif',
+            'tool-codeql-basic.javascript.sarif',
+            'tool-snyk-code.sarif'
+        ]
+        paths = self.find_output_files(sarif_filenames + [
+            'tool-application-inspector.json',
+            'tool-oss-detect-cryptography.txt',
+            'tool-clamscan.txt',
+            'tool-metadata-native.json',
+        ])
+
+        assertions = [
+            # Scorecards
+            {"assertion": "SecurityScorecard"},
+            # Security Advisories
+            {"assertion": "SecurityAdvisory"},
+            # Reproducibility
+            {"assertion": "Reproducible"},
+        ]
 
         # Static Analyzers (SARIF)
-        for _filename in ['tool-semgrep.sarif', 'tool-devskim.sarif', 'tool-codeql-basic.javascript.sarif', 'tool-snyk-code.sarif']:
-            self._execute_assertion_noexcept(
-                **{
+        for _filename in sarif_filenames:
+            assertions.append(
+                {
                     "assertion": "SecurityToolFinding",
-                    "subject": self.package_url,
-                    "input-file": self.find_output_file(_filename),
-                    "repository": self.repository,
-                    "signer": self.signer,
+                    "input-file": paths.get(_filename),
                     "extra-args": "include_evidence=false"
                 }
             )
 
-        # Programming Language
-        self._execute_assertion_noexcept(
-            **{
+        assertions += [
+            # Programming Language
+            {
                 "assertion": "ProgrammingLanguage",
-                "subject": self.package_url,
-                "input-file": self.find_output_file("tool-application-inspector.json"),
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
-
-        # Characteristics
-        self._execute_assertion_noexcept(
-            **{
+                "input-file": paths.get("tool-application-inspector.json")
+            },
+            # Characteristics
+            {
                 "assertion": "Characteristic",
-                "subject": self.package_url,
-                "input-file": self.find_output_file("tool-application-inspector.json"),
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
-
-        # Cryptographic Implementations
-        self._execute_assertion_noexcept(
-            **{
+                "input-file": paths.get("tool-application-inspector.json")
+            },
+            # Cryptographic Implementations
+            {
                 "assertion": "CryptoImplementation",
-                "subject": self.package_url,
-                "input-file": self.find_output_file("tool-oss-detect-cryptography.txt"),
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
-
-        # Cryptographic Implementations
-        self._execute_assertion_noexcept(
-            **{
+                "input-file": paths.get("tool-oss-detect-cryptography.txt")
+            },
+            # Malware (ClamAV)
+            {
                 "assertion": "ClamAV",
-                "subject": self.package_url,
-                "input-file": self.find_output_file("tool-clamscan.txt"),
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
-
-        # Metadata
-        self._execute_assertion_noexcept(
-            **{
+                "input-file": paths.get("tool-clamscan.txt")
+            },
+            # Metadata
+            {
                 "assertion": "Metadata",
-                "subject": self.package_url,
-                "input-file": self.find_output_file("tool-metadata-native.json"),
-                "repository": self.repository,
-                "signer": self.signer
-            }
-        )
+                "input-file": paths.get("tool-metadata-native.json")
+            },
+        ]
+
+        self._execute_assertions_batch(assertions)
 
 
 if __name__ == "__main__":
@@ -293,7 +352,15 @@ if __name__ == "__main__":
     parser.add_argument(
         "--signer", required=False
     )
+    parser.add_argument(
+        "--log-level",
+        required=False,
+        default="DEBUG",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging level; toolchain container output is only captured at DEBUG.",
+    )
     args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
 
     logging.info("Starting analysis runner")
     runner = AnalysisRunner(args.package_url, args.toolchain_container, args.repository, args.signer, args.work_directory)
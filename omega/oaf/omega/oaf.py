@@ -74,6 +74,12 @@ class OAF:
         )
         p_generate.add_argument("--expiration", help="Expiration date", type=str, required=False)
         p_generate.add_argument("--extra-args", help="Extra parameters (key=value)", type=str, required=False)
+        p_generate.add_argument(
+            "--batch",
+            help="JSON file listing assertions to generate (entries override the options above)",
+            type=str,
+            required=False,
+        )
 
         # Consume Assertions
         p_consume = subparsers.add_parser("consume", help="Consume assertions")
@@ -139,37 +145,58 @@ class OAF:
             OAF.Generate.list_assertions()
             sys.exit(1)
 
+        if args.batch:
+            success = True
+            for batch_args in OAF.Generate.load_batch(args.batch, args):
+                try:
+                    if not self.generate_and_store(batch_args):
+                        success = False
+                except Exception as msg:
+                    logging.error("Error generating assertion %s: %s", batch_args.assertion, msg)
+                    success = False
+            sys.exit(0 if success else 1)
+
         if args.assertion and args.subject:
-            assertion = OAF.Generate.generate_assertion(args.assertion, args.subject, args)
-            if not assertion:
-                logging.error("No assertion was generated.")
+            if not self.generate_and_store(args):
                 sys.exit(1)
-
-            assertion.finalize()
-            assertion.emit()
-
-            if args.signer:
-                signer = BaseSigner.create_signer(args.signer)
-                signer.sign(assertion)
-                if not signer.verify(assertion.serialize("json")):
-                    logging.error("Error verifying signature")
-                    sys.exit(1)
-
-            if args.repository:
-                repository = BaseRepository.create_repository(args.repository)
-                if repository.add_assertion(assertion):
-                    print("Assertion added to repository.")
-                    logging.debug(assertion.serialize("json-pretty"))
-                else:
-                    print("Error adding assertion to repository.")
-            else:
-                print(assertion.serialize("json-pretty"))
-
             sys.exit(0)
         else:
             print("An assertion and a subject must be specified.")
             sys.exit(1)
 
+    def generate_and_store(self, args) -> bool:
+        """Generates a single assertion, then signs and stores it as requested."""
+        if not (args.assertion and args.subject):
+            logging.error("An assertion and a subject must be specified.")
+            return False
+
+        assertion = OAF.Generate.generate_assertion(args.assertion, args.subject, args)
+        if not assertion:
+            logging.error("No assertion was generated.")
+            return False
+
+        assertion.finalize()
+        assertion.emit()
+
+        if args.signer:
+            signer = BaseSigner.create_signer(args.signer)
+            signer.sign(assertion)
+            if not signer.verify(assertion.serialize("json")):
+                logging.error("Error verifying signature")
+                return False
+
+        if args.repository:
+            repository = BaseRepository.create_repository(args.repository)
+            if repository.add_assertion(assertion):
+                print("Assertion added to repository.")
+                logging.debug(assertion.serialize("json-pretty"))
+            else:
+                print("Error adding assertion to repository.")
+        else:
+            print(assertion.serialize("json-pretty"))
+
+        return True
+
     def parse_args_consume(self, args):
         """Parses arguments for the 'consume' command."""
         if args.extension_dir:
@@ -292,6 +319,21 @@ class OAF:
             )
             return None
 
+        @staticmethod
+        def load_batch(filename: str, defaults: argparse.Namespace) -> list[argparse.Namespace]:
+            """Loads a batch file (a JSON list of objects) into one namespace per assertion."""
+            with open(filename, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+
+            results = []
+            for entry in entries:
+                _args = vars(defaults).copy()
+                _args["batch"] = None
+                for key, value in entry.items():
+                    _args[key.replace("-", "_")] = value
+                results.append(argparse.Namespace(**_args))
+            return results
+
         @staticmethod
         def parse_kv_args(args):
             """Parses a key=value string or a list of key=value strings into a dict."""